@@ -1,12 +1,20 @@
 import asyncio
+import fcntl
+import hashlib
+import itertools
 import logging
 import os
 import time
 import random
-import requests
 import re
+import aiohttp
+import numpy as np
+import orjson
+from collections import OrderedDict, deque
 from nio import AsyncClient, RoomMessageText, SyncResponse
-from openai import AsyncOpenAI, RateLimitError
+
+# Monotonic clock for interval math; time.time() is kept for wall-clock timestamps
+_monotonic = time.monotonic
 
 # Get environment variables for sensitive information
 MATRIX_SERVER = os.environ.get("MATRIX_SERVER", "https://matrix.org")
@@ -22,6 +30,9 @@ PARTICLE_DEVICE_ID = os.environ.get("PARTICLE_DEVICE_ID")
 PARTICLE_ACCESS_TOKEN = os.environ.get("PARTICLE_ACCESS_TOKEN")
 PARTICLE_FUNCTION_NAME = os.environ.get("PARTICLE_FUNCTION_NAME", "timerExpired")
 
+# File used to persist the Matrix sync token between restarts
+NEXT_BATCH_FILE = os.environ.get("NEXT_BATCH_FILE", os.path.expanduser("~/.elementbot_next_batch"))
+
 
 # System prompt from environment variable with a default
 SYSTEM_PROMPT = os.environ.get("SYSTEM_PROMPT", """
@@ -50,31 +61,118 @@ if missing_vars:
 # Matrix client setup
 client = AsyncClient(MATRIX_SERVER, MATRIX_USER)
 
-# OpenAI client setup
-openai_client = AsyncOpenAI(api_key=BOT_OPENAI_API_KEY)
+# OpenAI client and its HTTP pool, created in main() so importing this module
+# and failing on missing environment variables stay cheap
+openai_http_client = None
+openai_client = None
+
+class _RateLimitPlaceholder(Exception):
+    """Stands in for openai.RateLimitError until main() imports openai; never raised"""
+
+RateLimitError = _RateLimitPlaceholder  # Rebound to openai.RateLimitError in main()
 
-# Rate limiting variables
-last_api_call = 0
-min_delay_between_calls = 3.0  # Increased to 3 seconds minimum between calls
-jitter = 2.0  # Add random jitter of up to 2 seconds to avoid synchronized calls
+class AsyncTokenBucket:
+    """Async token bucket that only makes callers wait once the burst capacity is used up"""
+    
+    def __init__(self, rate, capacity):
+        self.rate = rate  # Tokens added per second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last = _monotonic()
+        self.lock = asyncio.Lock()
+    
+    async def acquire(self):
+        """Take one token, sleeping until one is available if the bucket is empty"""
+        async with self.lock:
+            while True:
+                now = _monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+                logging.info(f"Rate limiting: Waiting {wait_time:.2f} seconds before API call")
+                await asyncio.sleep(wait_time)
+
+# Rate limiting: bursts of up to 3 calls, refilling at one call every 3 seconds
+rate_limiter = AsyncTokenBucket(rate=1 / 3, capacity=3)
 
 # Track the last event timestamp we've seen to ignore historical messages
 # This will be set to the current time after the initial sync
 initial_sync_done = False
 connection_timestamp = 0
 
+# Lock file held while this process owns NEXT_BATCH_FILE, and the last token written to it
+next_batch_lock_file = None
+saved_next_batch = None
+
 # Add a flag to track if we're in cooldown mode after hitting rate limits
 in_cooldown = False
 cooldown_until = 0
 cooldown_period = 60  # 1 minute cooldown after hitting rate limits
 
-# Dictionary to store active timers
+# LRU cache of AI responses keyed by a hash of model, prompt and normalized message
+response_cache = OrderedDict()
+response_cache_size = 512
+_MENTION_RE = re.compile(r"@[^\s:]+:[^\s]+\s*")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Semantic cache for paraphrased messages, stored as a FIFO ring buffer of
+# L2-normalized sentence embeddings alongside the matching responses.
+# Embeddings are kept as int8 with a per-vector scale, and lookups score them in
+# chunks, so no full-size float32 copy of the cache exists at any point.
+# The cache is optional and is disabled if sentence-transformers is not installed
+# or the model fails to load.
+embedding_model = None  # Loaded on first use by get_embedding_model()
+semantic_cache_enabled = True
+semantic_cache_size = 1024
+semantic_cache_threshold = 0.92
+semantic_lookup_chunk = 128  # Rows widened to float32 per step of a lookup
+semantic_embeddings = None
+semantic_scales = None
+semantic_responses = []
+semantic_next_slot = 0
+
+# Plain timer requests are parsed locally instead of asking the AI
+# The lookbehinds stop "1.5 minutes" or "1,5 minutes" being read as 5 minutes
+_TIMER_RE = re.compile(
+    r"(?i)\b(?:set\s+)?(?:a\s+)?timer\s+for\s+(?<![\d.,])(\d+)\s*"
+    r"(s|sec|secs|seconds?|m|min|mins|minutes?|h|hr|hrs|hours?)\b"
+    r"|(?<![\d.,])\b(\d+)\s*(seconds?|minutes?|hours?)\b"
+)
+# Any number followed by a unit, used to spot messages with more than one duration
+_DURATION_RE = re.compile(
+    r"(?i)(?<![\d.,])\b\d+\s*(?:s|sec|secs|seconds?|m|min|mins|minutes?|h|hr|hrs|hours?)\b"
+)
+# Broad check for anything the AI might answer with a timer, including word numbers
+# and decimals the local parser rejects. Such messages are never merged together.
+_TIME_HINT_RE = re.compile(
+    r"(?i)\btimer\b|\d\s*(?:s|m|h)\b"
+    r"|\b(?:sec|secs|seconds?|min|mins|minutes?|hr|hrs|hours?)\b"
+)
+_TIMER_RESPONSE_RE = re.compile(r'^\s*\{"time":\s*(\d+)\s*\}\s*$')
+_TIMER_UNITS = {
+    "s": 1, "sec": 1, "secs": 1, "second": 1, "seconds": 1,
+    "m": 60, "min": 60, "mins": 60, "minute": 60, "minutes": 60,
+    "h": 3600, "hr": 3600, "hrs": 3600, "hour": 3600, "hours": 3600,
+}
+
+# Pending messages and the worker task draining them, per (room_id, sender)
+pending_messages = {}
+message_workers = {}
+
+# Dictionary to store active timers, plus a counter that keeps timer IDs unique
 active_timers = {}
+_timer_counter = itertools.count(1)
+
+# Shared HTTP session for Particle API calls, created in main()
+particle_session: aiohttp.ClientSession | None = None
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-def call_particle_function(argument="triggered"):
+async def call_particle_function(argument="triggered"):
     """Call the function on the Particle device"""
     if not PARTICLE_DEVICE_ID or not PARTICLE_ACCESS_TOKEN:
         logger.warning("Particle device ID or access token not set, skipping function call")
@@ -93,14 +191,22 @@ def call_particle_function(argument="triggered"):
             "arg": argument
         }
         
-        response = requests.post(url, headers=headers, data=data)
+        async with particle_session.post(
+            url,
+            data=data,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=10)
+        ) as response:
+            body = await response.read()
         
-        if response.status_code == 200:
-            result = response.json()
-            logger.info(f"Particle function call successful, returned: {result.get('return_value', 'No return value')}")
+        if response.status == 200:
+            # The body is only needed for the log line
+            if logger.isEnabledFor(logging.INFO):
+                result = orjson.loads(body)
+                logger.info(f"Particle function call successful, returned: {result.get('return_value', 'No return value')}")
             return True
         else:
-            logger.error(f"Error calling Particle function: {response.status_code} - {response.text}")
+            logger.error(f"Error calling Particle function: {response.status} - {body.decode('utf-8', 'replace')[:512]}")
             return False
             
     except Exception as e:
@@ -114,27 +220,26 @@ async def timer_handler(room_id, timer_id):
     
     logger.info(f"Timer {timer_id} expired for room {room_id}!")
     
-    if timer_id in active_timers:
-        del active_timers[timer_id]
-    
-
-    # Call the Particle function
-    particle_result = call_particle_function()
-    # Send a message to the room
-    if room_id:
-        try:
-            await client.room_send(
-                room_id,
-                message_type="m.room.message",
-                content={"msgtype": "m.text", "body": "Timer expired!"}
-            )
-            logger.info(f"Sent timer expiration message to room {room_id}")
-        except Exception as e:
-            logger.error(f"Error sending timer expiration message: {e}")
+    try:
+        # Call the Particle function
+        particle_result = await call_particle_function()
+        # Send a message to the room
+        if room_id:
+            try:
+                await client.room_send(
+                    room_id,
+                    message_type="m.room.message",
+                    content={"msgtype": "m.text", "body": "Timer expired!"}
+                )
+                logger.info(f"Sent timer expiration message to room {room_id}")
+            except Exception as e:
+                logger.error(f"Error sending timer expiration message: {e}")
+    finally:
+        active_timers.pop(timer_id, None)
 
 def set_timer(seconds, room_id):
     """Set a timer that will call timer_handler after specified seconds"""
-    timer_id = f"timer_{int(time.time())}_{random.randint(1000, 9999)}"
+    timer_id = f"timer_{time.time_ns()}_{next(_timer_counter)}"
     logger.info(f"Setting timer {timer_id} for {seconds} seconds in room {room_id}")
     
     # Create an async task to handle the timer
@@ -145,35 +250,156 @@ def set_timer(seconds, room_id):
     # Schedule the timer task
     task = asyncio.create_task(timer_task())
     
-    # Store the task
+    # Store the task, and drop it again however it finishes (including cancellation)
     active_timers[timer_id] = task
+    task.add_done_callback(lambda t, tid=timer_id: active_timers.pop(tid, None))
     
     return timer_id
 
-async def get_ai_response(user_message):
-    """Get a response from the OpenAI API with improved rate limiting and error handling."""
-    global last_api_call, in_cooldown, cooldown_until
+async def cancel_active_timers():
+    """Cancel all pending timers and wait for them to finish"""
+    tasks = list(active_timers.values())
+    if not tasks:
+        return
+    logger.info(f"Cancelling {len(tasks)} active timer(s)")
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    active_timers.clear()
+
+def may_be_timer_request(message):
+    """Return True if the message could be a timer request, locally parsed or not"""
+    return _TIME_HINT_RE.search(message) is not None
+
+def parse_timer_request(message):
+    """Return the timer duration in seconds if the message is a plain timer request, else None
     
-    now = time.time()
+    Only a single whole number with a unit is handled here. Anything else, such as
+    "1 hour 30 minutes", is left to the AI.
+    """
+    match = _TIMER_RE.search(message)
+    if not match or len(_DURATION_RE.findall(message)) != 1:
+        return None
+    amount = match.group(1) or match.group(3)
+    unit = (match.group(2) or match.group(4)).lower()
+    return int(amount) * _TIMER_UNITS[unit]
+
+def get_embedding_model():
+    """Load the sentence embedding model the first time it is needed, or return None if unavailable"""
+    global embedding_model, semantic_cache_enabled
     
-    # Check if we're in cooldown mode
+    if embedding_model is None and semantic_cache_enabled:
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            logger.warning("sentence-transformers is not installed, semantic cache disabled")
+            semantic_cache_enabled = False
+            return None
+        logger.info("Loading sentence embedding model for the semantic cache")
+        try:
+            embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
+        except Exception as e:
+            # e.g. the model download failed or the local model cache is corrupt
+            logger.warning(f"Could not load sentence embedding model, semantic cache disabled: {e}")
+            semantic_cache_enabled = False
+            return None
+    return embedding_model
+
+def quantize_embedding(embedding):
+    """Quantize a float embedding to int8, returning the int8 vector and its scale"""
+    scale = max(float(np.abs(embedding).max()), 1e-6) / 127
+    quantized = np.clip(np.round(embedding / scale), -127, 127).astype(np.int8)
+    return quantized, np.float32(scale)
+
+def semantic_cache_lookup(embedding):
+    """Return the cached response most similar to the embedding, if close enough"""
+    if not semantic_responses:
+        return None
+    count = len(semantic_responses)
+    best, best_sim = -1, -np.inf
+    # Score a chunk of rows at a time so the int8 -> float32 widening for the
+    # product only ever materializes semantic_lookup_chunk rows
+    for start in range(0, count, semantic_lookup_chunk):
+        stop = min(start + semantic_lookup_chunk, count)
+        sims = (semantic_embeddings[start:stop] @ embedding) * semantic_scales[start:stop]
+        i = int(np.argmax(sims))
+        if sims[i] > best_sim:
+            best, best_sim = start + i, float(sims[i])
+    if best_sim > semantic_cache_threshold:
+        logging.info(f"Semantic cache hit (similarity {best_sim:.3f})")
+        return semantic_responses[best]
+    return None
+
+def semantic_cache_store(embedding, content):
+    """Store a response in the semantic cache, overwriting the oldest entry when full"""
+    global semantic_embeddings, semantic_scales, semantic_next_slot
+    
+    if semantic_embeddings is None:
+        semantic_embeddings = np.empty((semantic_cache_size, embedding.shape[0]), dtype=np.int8)
+        semantic_scales = np.empty(semantic_cache_size, dtype=np.float32)
+    
+    semantic_embeddings[semantic_next_slot], semantic_scales[semantic_next_slot] = quantize_embedding(embedding)
+    if semantic_next_slot < len(semantic_responses):
+        semantic_responses[semantic_next_slot] = content
+    else:
+        semantic_responses.append(content)
+    semantic_next_slot = (semantic_next_slot + 1) % semantic_cache_size
+
+def normalize_message(message):
+    """Reduce a message to its cache-relevant form: no mentions, collapsed whitespace, lowercase"""
+    message = _MENTION_RE.sub("", message)
+    message = _WHITESPACE_RE.sub(" ", message).strip().lower()
+    # Only trailing punctuation is dropped, so durations like "1.5 minutes" stay distinct
+    return message.rstrip(".!?")
+
+def check_cooldown():
+    """Return the cooldown reply if we're still in cooldown mode, clearing it once expired"""
+    global in_cooldown
+    
+    now = _monotonic()
     if in_cooldown and now < cooldown_until:
         remaining = int(cooldown_until - now)
         return f"I'm currently in cooldown mode due to rate limiting. Please try again in {remaining} seconds."
-    else:
-        in_cooldown = False
+    in_cooldown = False
+    return None
+
+async def get_ai_response(user_message):
+    """Get a response from the OpenAI API with improved rate limiting and error handling."""
+    global in_cooldown, cooldown_until
     
-    # Implement rate limiting with jitter
-    time_since_last_call = now - last_api_call
-    required_delay = min_delay_between_calls + random.uniform(0, jitter)
+    # Serve repeated messages from the cache without calling the API
+    cache_key = hashlib.blake2b(
+        f"{OPENAI_MODEL}\x00{SYSTEM_PROMPT}\x00{normalize_message(user_message)}".encode(),
+        digest_size=16
+    ).digest()
+    if cache_key in response_cache:
+        response_cache.move_to_end(cache_key)
+        logging.info("Returning cached AI response")
+        return response_cache[cache_key]
     
-    if time_since_last_call < required_delay:
-        wait_time = required_delay - time_since_last_call
-        logging.info(f"Rate limiting: Waiting {wait_time:.2f} seconds before API call")
-        await asyncio.sleep(wait_time)
+    # Fall back to the semantic cache for near-duplicate messages. Encoding runs
+    # in a worker thread so model inference doesn't stall the event loop.
+    embedding = None
+    model = get_embedding_model()
+    if model is not None:
+        vectors = await asyncio.to_thread(model.encode, [user_message], normalize_embeddings=True)
+        embedding = vectors[0].astype(np.float32)
+        cached = semantic_cache_lookup(embedding)
+        if cached is not None:
+            return cached
     
-    # Update last call time
-    last_api_call = time.time()
+    # Check if we're in cooldown mode
+    cooldown_message = check_cooldown()
+    if cooldown_message:
+        return cooldown_message
+    
+    # Only wait if recent calls have used up the rate limit budget
+    await rate_limiter.acquire()
+    
+    # Another call may have entered cooldown while we were waiting
+    cooldown_message = check_cooldown()
+    if cooldown_message:
+        return cooldown_message
     
     # Try to get response with exponential backoff
     max_retries = 5
@@ -182,25 +408,47 @@ async def get_ai_response(user_message):
     for attempt in range(max_retries):
         try:
             logging.info(f"Attempt {attempt+1}/{max_retries} to call OpenAI API")
-            response = await openai_client.chat.completions.create(
+            stream = await openai_client.chat.completions.create(
                 model=OPENAI_MODEL,
                 messages=[
                     {"role": "system", "content": SYSTEM_PROMPT},
                     {"role": "user", "content": user_message}
-                ]
+                ],
+                max_tokens=64,
+                temperature=0,
+                stream=True
             )
-            return response.choices[0].message.content
+            
+            # Stop reading as soon as a complete timer reply has arrived
+            content = ""
+            async for chunk in stream:
+                if chunk.choices:
+                    content += chunk.choices[0].delta.content or ""
+                if _TIMER_RESPONSE_RE.match(content):
+                    await stream.close()
+                    break
+            
+            # Cache successful responses, evicting the least recently used
+            if not in_cooldown and content and not content.startswith(("Sorry,", "I've hit")):
+                response_cache[cache_key] = content
+                if len(response_cache) > response_cache_size:
+                    response_cache.popitem(last=False)
+                # Timer replies depend on the exact duration, so keep them out of the semantic cache
+                if embedding is not None and not content.lstrip().startswith('{"time":'):
+                    semantic_cache_store(embedding, content)
+            
+            return content
         
         except RateLimitError as e:
             if attempt < max_retries - 1:
-                wait_time = retry_delay * (2 ** attempt) + random.uniform(0, 2)  # Exponential backoff with jitter
+                wait_time = retry_delay * (2 ** attempt) + 2.0 * random.random()  # Exponential backoff with jitter
                 logging.warning(f"Rate limit hit. Waiting {wait_time:.2f} seconds before retry.")
                 await asyncio.sleep(wait_time)
             else:
                 logging.error(f"Rate limit exceeded after {max_retries} attempts: {e}")
                 # Enter cooldown mode
                 in_cooldown = True
-                cooldown_until = time.time() + cooldown_period
+                cooldown_until = _monotonic() + cooldown_period
                 return "I've hit the API rate limit. I'm entering cooldown mode for 1 minute to avoid further rate limiting. Please try again later."
         
         except Exception as e:
@@ -228,13 +476,62 @@ async def message_callback(room, event):
         logger.info(f"Message timestamp: {event_timestamp}, Connection timestamp: {connection_timestamp}")
         return
     
-    logger.info(f"Processing new message in {room.room_id} from {event.sender}: {event.body}")
+    logger.info(f"Queueing new message in {room.room_id} from {event.sender}: {event.body}")
+    key = (room.room_id, event.sender)
+    pending_messages.setdefault(key, deque()).append(event.body)
+    if key not in message_workers:
+        message_workers[key] = asyncio.create_task(message_worker(key, room))
+
+async def message_worker(key, room):
+    """Reply to one sender's pending messages in order, then exit
     
-    # Get response from OpenAI
-    response = await get_ai_response(event.body)
+    Anything that may be a timer request is handled one by one, since an AI reply
+    can only set one timer. Chit-chat that piles up while a reply is in flight is
+    merged into a single AI request.
+    """
+    pending = pending_messages[key]
+    try:
+        while pending:
+            body = pending.popleft()
+            if not may_be_timer_request(body):
+                bodies = [body]
+                while pending and not may_be_timer_request(pending[0]):
+                    queued_body = pending.popleft()
+                    # Drop exact repeats, they would get the same answer
+                    if queued_body not in bodies:
+                        bodies.append(queued_body)
+                if len(bodies) > 1:
+                    logger.info(f"Coalesced {len(bodies)} messages from {key[1]}")
+                body = "\n".join(bodies)
+            try:
+                await handle_message(room, body)
+            except Exception as e:
+                logger.error(f"Error handling message from {key[1]}: {e}")
+    finally:
+        pending_messages.pop(key, None)
+        message_workers.pop(key, None)
+
+async def cancel_message_workers():
+    """Cancel the per-sender message workers and wait for them to finish"""
+    tasks = list(message_workers.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+async def handle_message(room, body):
+    """Work out a reply to a message and send it to the room"""
+    logger.info(f"Processing new message in {room.room_id}: {body}")
+    
+    # Handle plain timer requests locally, otherwise ask OpenAI
+    local_seconds = parse_timer_request(body)
+    if local_seconds is not None:
+        logger.info(f"Parsed timer request locally: {local_seconds} seconds")
+        response = orjson.dumps({"time": local_seconds}).decode()
+    else:
+        response = await get_ai_response(body)
     
     # Check if the response is a timer request (matching {"time":X})
-    timer_match = re.match(r'^\s*{"time":(\d+)}\s*$', response)
+    timer_match = _TIMER_RESPONSE_RE.match(response)
     if timer_match:
         try:
             # Extract timer duration
@@ -264,10 +561,57 @@ def format_time_duration(seconds):
     """Format seconds into a human-readable time duration"""
     return f"{seconds} seconds"
 
+def acquire_next_batch_lock():
+    """Take an exclusive lock on the sync token file so only one bot instance uses it"""
+    global next_batch_lock_file
+    
+    try:
+        lock_file = open(f"{NEXT_BATCH_FILE}.lock", "w")
+    except OSError as e:
+        logger.warning(f"Could not open sync token lock file, not persisting the sync token: {e}")
+        return False
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        logger.warning(f"{NEXT_BATCH_FILE} is locked by another instance, not persisting the sync token")
+        return False
+    next_batch_lock_file = lock_file
+    return True
+
+def load_next_batch():
+    """Return the sync token saved by a previous run, if any"""
+    try:
+        with open(NEXT_BATCH_FILE) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logger.warning(f"Could not read saved sync token: {e}")
+        return None
+
+def save_next_batch(token):
+    """Atomically write the sync token so a restart can resume from it"""
+    global saved_next_batch
+    
+    if next_batch_lock_file is None or token == saved_next_batch:
+        return
+    tmp_path = f"{NEXT_BATCH_FILE}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            f.write(token)
+        os.replace(tmp_path, NEXT_BATCH_FILE)
+        saved_next_batch = token
+    except OSError as e:
+        logger.warning(f"Could not save sync token: {e}")
+
 async def sync_callback(response):
     """Update the initial sync status when we receive a sync"""
     global initial_sync_done, connection_timestamp
     
+    if isinstance(response, SyncResponse) and response.next_batch:
+        save_next_batch(response.next_batch)
+    
     if isinstance(response, SyncResponse) and response.next_batch and not initial_sync_done:
         # Mark the initial sync as complete and set connection timestamp
         initial_sync_done = True
@@ -276,55 +620,92 @@ async def sync_callback(response):
         logger.info("Bot will now only respond to new messages from this point forward.")
 
 async def main():
-    global initial_sync_done, connection_timestamp
-    
-    # Add a startup delay to ensure any previous rate limits have cleared
-    startup_delay = random.uniform(5, 10)
-    logging.info(f"Starting up with initial delay of {startup_delay:.2f} seconds to avoid rate limits")
-    await asyncio.sleep(startup_delay)
+    global initial_sync_done, connection_timestamp, particle_session
+    global openai_http_client, openai_client, RateLimitError
     
-    login_response = await client.login(MATRIX_PASSWORD)
-    if hasattr(login_response, "user_id"):
-        client.user_id = login_response.user_id
-        logging.info(f"Logged in as: {client.user_id}")
-    else:
-        logging.error("Login failed")
-        return
-
-    join_response = await client.join(MATRIX_ROOM_ALIAS)
-    logging.debug(f"Join response: {join_response}")
-    if hasattr(join_response, "room_id"):
-        logging.info(f"Joined room: {MATRIX_ROOM_ALIAS} (room id: {join_response.room_id})")
-    else:
-        logging.error(f"Failed to join room: {MATRIX_ROOM_ALIAS}. Check if the room is public or if you need an invite.")
-
-    # Register callbacks
-    client.add_event_callback(message_callback, RoomMessageText)
-    client.add_response_callback(sync_callback)
-    
-    # Do an initial sync to get caught up with the room state
-    logger.info("Starting initial sync - this will establish our message timestamp cutoff")
-    initial_sync = await client.sync(timeout=30000)
-    
-    # Force setting these values in case the sync callback doesn't trigger
-    if not initial_sync_done:
-        initial_sync_done = True
-        connection_timestamp = time.time()
-        logger.info(f"Setting connection_timestamp to {connection_timestamp} after manual sync")
-    
-    # Send a startup message to the room
-    room_id = join_response.room_id
-    await client.room_send(
-        room_id,
-        message_type="m.room.message",
-        content={
-            "msgtype": "m.text", 
-            "body": "Bot is now online and ready to chat! I'll only respond to messages sent after this point."
-        }
+    # OpenAI client setup, with a keep-alive HTTP/2 pool so back-to-back
+    # messages reuse the connection to api.openai.com
+    import httpx
+    from openai import AsyncOpenAI, RateLimitError as _RateLimitError
+    RateLimitError = _RateLimitError
+    openai_http_client = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=4, max_connections=8, keepalive_expiry=60),
+        timeout=httpx.Timeout(30.0, connect=5.0)
     )
     
-    logger.info("Bot started. Waiting for messages...")
-    await client.sync_forever(timeout=30000)
+    try:
+        openai_client = AsyncOpenAI(api_key=BOT_OPENAI_API_KEY, http_client=openai_http_client)
+        
+        # Reuse one connection pool for all Particle calls
+        particle_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=10, keepalive_timeout=75)
+        )
+        
+        # Load the embedding model off the event loop before announcing we're ready
+        await asyncio.to_thread(get_embedding_model)
+        
+        # Add a startup delay to ensure any previous rate limits have cleared
+        startup_delay = random.uniform(5, 10)
+        logging.info(f"Starting up with initial delay of {startup_delay:.2f} seconds to avoid rate limits")
+        await asyncio.sleep(startup_delay)
+        
+        login_response = await client.login(MATRIX_PASSWORD)
+        if hasattr(login_response, "user_id"):
+            client.user_id = login_response.user_id
+            logging.info(f"Logged in as: {client.user_id}")
+        else:
+            logging.error("Login failed")
+            return
+        
+        join_response = await client.join(MATRIX_ROOM_ALIAS)
+        logging.debug(f"Join response: {join_response}")
+        if hasattr(join_response, "room_id"):
+            logging.info(f"Joined room: {MATRIX_ROOM_ALIAS} (room id: {join_response.room_id})")
+        else:
+            logging.error(f"Failed to join room: {MATRIX_ROOM_ALIAS}. Check if the room is public or if you need an invite.")
+        
+        # Register callbacks
+        client.add_event_callback(message_callback, RoomMessageText)
+        client.add_response_callback(sync_callback)
+        
+        # Resume from the previous run's sync token if we have one
+        saved_token = load_next_batch() if acquire_next_batch_lock() else None
+        if saved_token:
+            client.next_batch = saved_token
+            initial_sync_done = True
+            connection_timestamp = time.time()
+            logger.info(f"Resuming sync from saved token, setting connection_timestamp to {connection_timestamp}")
+        else:
+            # Do an initial sync to get caught up with the room state
+            logger.info("Starting initial sync - this will establish our message timestamp cutoff")
+            initial_sync = await client.sync(timeout=30000)
+        
+            # Force setting these values in case the sync callback doesn't trigger
+            if not initial_sync_done:
+                initial_sync_done = True
+                connection_timestamp = time.time()
+                logger.info(f"Setting connection_timestamp to {connection_timestamp} after manual sync")
+        
+        # Send a startup message to the room
+        room_id = join_response.room_id
+        await client.room_send(
+            room_id,
+            message_type="m.room.message",
+            content={
+                "msgtype": "m.text", 
+                "body": "Bot is now online and ready to chat! I'll only respond to messages sent after this point."
+            }
+        )
+        
+        logger.info("Bot started. Waiting for messages...")
+        await client.sync_forever(timeout=30000)
+    finally:
+        await cancel_message_workers()
+        await cancel_active_timers()
+        if particle_session is not None:
+            await particle_session.close()
+        await openai_http_client.aclose()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -1,9 +1,13 @@
 import asyncio
+import atexit
 import logging
 import os
 import time
 import random
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 PARTICLE_DEVICE_ID = os.environ.get("PARTICLE_DEVICE_ID")
 PARTICLE_ACCESS_TOKEN = os.environ.get("PARTICLE_ACCESS_TOKEN")
@@ -12,6 +16,17 @@ PARTICLE_FUNCTION_NAME = os.environ.get("PARTICLE_FUNCTION_NAME", "timerExpired"
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Persistent session so repeated calls reuse the TCP/TLS connection.
+# Only connection failures are retried: the request never reached the device,
+# whereas retrying after a read error or bad status could trigger it twice.
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=4,
+    max_retries=Retry(total=3, connect=3, read=0, status=0, backoff_factor=0.5)
+))
+atexit.register(_session.close)
+
 def call_particle_function(argument="triggered"):
     """Call the function on the Particle device"""
     if not PARTICLE_DEVICE_ID or not PARTICLE_ACCESS_TOKEN:
@@ -22,23 +37,24 @@ def call_particle_function(argument="triggered"):
         logger.info(f"Calling Particle function '{PARTICLE_FUNCTION_NAME}' on device {PARTICLE_DEVICE_ID}")
         
         url = f"https://api.particle.io/v1/devices/{PARTICLE_DEVICE_ID}/{PARTICLE_FUNCTION_NAME}"
-        headers = {
-            "Content-Type": "application/x-www-form-urlencoded"
-        }
         
         data = {
             "access_token": PARTICLE_ACCESS_TOKEN,
             "arg": argument
         }
         
-        response = requests.post(url, headers=headers, data=data)
+        response = _session.post(url, data=data, timeout=5)
+        
+        body = response.content
         
         if response.status_code == 200:
-            result = response.json()
-            logger.info(f"Particle function call successful, returned: {result.get('return_value', 'No return value')}")
+            # The body is only needed for the log line
+            if logger.isEnabledFor(logging.INFO):
+                result = orjson.loads(body)
+                logger.info(f"Particle function call successful, returned: {result.get('return_value', 'No return value')}")
             return True
         else:
-            logger.error(f"Error calling Particle function: {response.status_code} - {response.text}")
+            logger.error(f"Error calling Particle function: {response.status_code} - {body.decode('utf-8', 'replace')[:512]}")
             return False
             
     except Exception as e:
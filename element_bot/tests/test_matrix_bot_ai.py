@@ -0,0 +1,188 @@
+import os
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+
+# The bot module refuses to import without these set
+os.environ.setdefault("MATRIX_PASSWORD", "test-password")
+os.environ.setdefault("BOT_OPENAI_API_KEY", "test-key")
+
+from element_bot import matrix_bot_ai
+
+
+class ParseTimerRequestTest(unittest.TestCase):
+    def test_plain_timer_requests(self):
+        self.assertEqual(matrix_bot_ai.parse_timer_request("set timer for 10 minutes"), 600)
+        self.assertEqual(matrix_bot_ai.parse_timer_request("Set a Timer for 1 min"), 60)
+        self.assertEqual(matrix_bot_ai.parse_timer_request("timer for 15s"), 15)
+        self.assertEqual(matrix_bot_ai.parse_timer_request("wait 2 hours please"), 7200)
+
+    def test_decimal_durations_are_left_to_the_ai(self):
+        self.assertIsNone(matrix_bot_ai.parse_timer_request("set timer for 1.5 minutes"))
+        self.assertIsNone(matrix_bot_ai.parse_timer_request("set timer for 0.5 hours"))
+        self.assertIsNone(matrix_bot_ai.parse_timer_request("set timer for 1,5 minutes"))
+
+    def test_multiple_durations_are_left_to_the_ai(self):
+        self.assertIsNone(matrix_bot_ai.parse_timer_request("set a timer for 1 hour 30 minutes"))
+        self.assertIsNone(matrix_bot_ai.parse_timer_request("1 hour and 30 minutes"))
+
+    def test_non_timer_messages(self):
+        self.assertIsNone(matrix_bot_ai.parse_timer_request("hello there"))
+        self.assertIsNone(matrix_bot_ai.parse_timer_request("set a timer for ten minutes"))
+
+
+class NormalizeMessageTest(unittest.TestCase):
+    def test_case_whitespace_and_trailing_punctuation(self):
+        self.assertEqual(
+            matrix_bot_ai.normalize_message("  Set   Timer For 10 Minutes!  "),
+            "set timer for 10 minutes",
+        )
+
+    def test_mentions_are_removed(self):
+        self.assertEqual(
+            matrix_bot_ai.normalize_message("@steely-dan:matrix.org hello there?"),
+            "hello there",
+        )
+
+    def test_inner_punctuation_is_kept(self):
+        self.assertNotEqual(
+            matrix_bot_ai.normalize_message("1.5 minutes"),
+            matrix_bot_ai.normalize_message("15 minutes"),
+        )
+
+
+class AsyncTokenBucketTest(unittest.IsolatedAsyncioTestCase):
+    async def test_burst_is_immediate_then_waits_for_refill(self):
+        clock = [100.0]
+        sleeps = []
+
+        async def fake_sleep(seconds):
+            sleeps.append(seconds)
+            clock[0] += seconds
+
+        with mock.patch.object(matrix_bot_ai, "_monotonic", lambda: clock[0]), \
+                mock.patch.object(matrix_bot_ai.asyncio, "sleep", fake_sleep):
+            bucket = matrix_bot_ai.AsyncTokenBucket(rate=0.5, capacity=2)
+            await bucket.acquire()
+            await bucket.acquire()
+            self.assertEqual(sleeps, [])
+
+            await bucket.acquire()
+            self.assertEqual(len(sleeps), 1)
+            self.assertAlmostEqual(sleeps[0], 2.0)
+            self.assertAlmostEqual(bucket.tokens, 0.0)
+
+    async def test_idle_time_refills_up_to_capacity(self):
+        clock = [100.0]
+
+        async def fake_sleep(seconds):
+            self.fail("acquire() should not sleep while tokens are available")
+
+        with mock.patch.object(matrix_bot_ai, "_monotonic", lambda: clock[0]), \
+                mock.patch.object(matrix_bot_ai.asyncio, "sleep", fake_sleep):
+            bucket = matrix_bot_ai.AsyncTokenBucket(rate=0.5, capacity=2)
+            await bucket.acquire()
+            await bucket.acquire()
+            clock[0] += 60
+            await bucket.acquire()
+            self.assertAlmostEqual(bucket.tokens, 1.0)
+
+
+class SemanticCacheTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.multiple(
+            matrix_bot_ai,
+            semantic_embeddings=None,
+            semantic_scales=None,
+            semantic_responses=[],
+            semantic_next_slot=0,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _unit_vector(self, seed):
+        vector = np.random.default_rng(seed).standard_normal(384).astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def test_quantize_embedding_round_trip(self):
+        vector = self._unit_vector(0)
+        quantized, scale = matrix_bot_ai.quantize_embedding(vector)
+        self.assertEqual(quantized.dtype, np.int8)
+        restored = quantized.astype(np.float32) * scale
+        self.assertGreater(float(restored @ vector), 0.99)
+
+    def test_lookup_returns_stored_response_for_matching_embedding(self):
+        matrix_bot_ai.semantic_cache_store(self._unit_vector(1), "first")
+        matrix_bot_ai.semantic_cache_store(self._unit_vector(2), "second")
+        self.assertEqual(matrix_bot_ai.semantic_cache_lookup(self._unit_vector(2)), "second")
+        self.assertIsNone(matrix_bot_ai.semantic_cache_lookup(self._unit_vector(3)))
+
+    def test_lookup_finds_best_match_across_chunks(self):
+        for seed in range(5):
+            matrix_bot_ai.semantic_cache_store(self._unit_vector(seed), f"response {seed}")
+        with mock.patch.object(matrix_bot_ai, "semantic_lookup_chunk", 2):
+            self.assertEqual(matrix_bot_ai.semantic_cache_lookup(self._unit_vector(0)), "response 0")
+            self.assertEqual(matrix_bot_ai.semantic_cache_lookup(self._unit_vector(4)), "response 4")
+
+
+class GetEmbeddingModelTest(unittest.TestCase):
+    def test_model_load_failure_disables_semantic_cache(self):
+        fake_module = SimpleNamespace(SentenceTransformer=mock.Mock(side_effect=OSError("no network")))
+        with mock.patch.dict("sys.modules", {"sentence_transformers": fake_module}), \
+                mock.patch.multiple(matrix_bot_ai, embedding_model=None, semantic_cache_enabled=True):
+            self.assertIsNone(matrix_bot_ai.get_embedding_model())
+            self.assertFalse(matrix_bot_ai.semantic_cache_enabled)
+            self.assertIsNone(matrix_bot_ai.get_embedding_model())
+        fake_module.SentenceTransformer.assert_called_once()
+
+
+class MessageWorkerTest(unittest.IsolatedAsyncioTestCase):
+    async def test_timers_are_handled_separately_and_chitchat_is_merged(self):
+        handled = []
+
+        async def fake_handle_message(room, body):
+            handled.append(body)
+
+        room = SimpleNamespace(room_id="!room:example.org")
+        key = (room.room_id, "@user:example.org")
+        matrix_bot_ai.pending_messages[key] = matrix_bot_ai.deque([
+            "set timer for 5 minutes",
+            "set timer for 10 minutes",
+            "hello",
+            "how are you?",
+            "hello",
+        ])
+        with mock.patch.object(matrix_bot_ai, "handle_message", fake_handle_message):
+            await matrix_bot_ai.message_worker(key, room)
+
+        self.assertEqual(handled, [
+            "set timer for 5 minutes",
+            "set timer for 10 minutes",
+            "hello\nhow are you?",
+        ])
+        self.assertNotIn(key, matrix_bot_ai.pending_messages)
+
+    async def test_ai_handled_timer_requests_are_not_merged(self):
+        handled = []
+
+        async def fake_handle_message(room, body):
+            handled.append(body)
+
+        room = SimpleNamespace(room_id="!room:example.org")
+        key = (room.room_id, "@user:example.org")
+        messages = [
+            "set a timer for ten minutes",
+            "set timer for 1.5 minutes",
+            "set a timer for 1 hour 30 minutes",
+        ]
+        matrix_bot_ai.pending_messages[key] = matrix_bot_ai.deque(messages)
+        with mock.patch.object(matrix_bot_ai, "handle_message", fake_handle_message):
+            await matrix_bot_ai.message_worker(key, room)
+
+        self.assertEqual(handled, messages)
+
+
+if __name__ == "__main__":
+    unittest.main()